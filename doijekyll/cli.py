@@ -19,8 +19,11 @@ Examples:
   $ doi-jekyll -vvv -af _authors/stephen.md -c _configs/config.yml --skip-url _posts/2022-08-01-abcdef.md
   Registers DOI metadata with DataCite (not the actual DOI URL), extracting blog-wide infos from non-standard "_configs/config.yml" and author-related infos from "_authors/stephen.md" file, skipping automatic discovery of author file. Will print lots of debug output, including the full submitted XML.
 
+  $ doi-jekyll _posts/2022-08-01-abcdef.md _posts/2022-08-15-ghijkl.md
+  Registers DOIs for two blog posts in one run, reusing the blog-wide data and the connection to DataCite.
+
       """, formatter_class=CustomRawDescriptionArgumentDefaultsHelpFormatter)
-    parser.add_argument('blogpost', type=argparse.FileType('r'), nargs=1, help='Markdown file (with YAML Frontmatter) to create DOI for')
+    parser.add_argument('blogpost', type=argparse.FileType('r'), nargs='+', help='Markdown file(s) (with YAML Frontmatter) to create DOI for; several posts are processed in one go')
     parser.add_argument('-c', '--config', metavar='JEKYLL_CONFIG', help='Jekyll _config.yml', default='_config.yml', type=argparse.FileType('r'))
     parser.add_argument('-ad', '--authors-dir', help='Directory with Author Markdown file with YAML Frontmatter', default='_authors')
     parser.add_argument('-af', '--author-file', help='Markdown file with YAML Frontmatter')
@@ -31,4 +34,12 @@ Examples:
     parser.add_argument('--skip-url', help="Don't register URL for entry", action='store_true')
     parser.add_argument('-d', '--dry-run', help="Dry Run: Don't communicate anything with DataCite", action='store_true')
     parser.add_argument('-v', '--verbose', action='count', default=0, help="Increase verbosity via increasing logging levels. -v: WARNING, -vv: INFO, -vvv: DEBUG. May also be used by included Python packages (for example DEBUG is used by urllib3).")
-    return parser.parse_args()
\ No newline at end of file
+    return parser.parse_args()
+def main():
+    """
+    Entry point of the `doi-jekyll` command.
+    Arguments are parsed before importing the actual workflow (and with it YAML, lxml, frontmatter, requests, ...), so that `--help` and usage errors return quickly.
+    """
+    args = parseArguments()
+    from . import doijekyll
+    return doijekyll.main(args)
\ No newline at end of file
@@ -1,22 +1,39 @@
 #!/usr/bin/env python3
 # SPDX-License-Identifier: MIT
 # Author: Andreas Herten, 2022
+import os
+import re
 import sys
-import json
 import yaml
 import base64
+import hashlib
 import datetime
 import logging
-from pathlib import PurePath
+import functools
 
-import requests
-import xmltodict
 import frontmatter
-import dateparser
+from lxml import etree
 
 from . import cli
 from . import metadata
 
+try:  # libyaml-based loader, if PyYAML was built with it
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+try:  # faster JSON serialization for debug output, if orjson is installed
+    import orjson
+    def _dumpJson(data):
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    import json
+    def _dumpJson(data):
+        return json.dumps(data, indent=4)
+
+_DATE_FORMATS = ('%Y-%m-%d %H:%M:%S %z', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M %z', '%Y-%m-%d %H:%M')  # Jekyll's usual date formats
+_FILENAME_RE = re.compile(r"(\d{4}-\d{1,2}-\d{1,2}-)(.*)")  # Jekyll post filenames: YEAR-MONTH-DAY-TITLE
+
 def setLogging(args):
     logging_levels = [logging.ERROR, logging.WARNING, logging.INFO, logging.DEBUG]
     logging_level_cleaned = logging_levels[min(args.verbose, len(logging_levels) - 1)]
@@ -35,19 +52,59 @@ def collectBlogData(file):
     Data in a dedicated key, 'doi_jekyll' is only used.
     In addition, the base url of the entire blog is needed, as specified in the top-level 'url' key of Jekyll's configuration.
     """
-    all_yaml = yaml.safe_load(file)
+    all_yaml = yaml.load(file, Loader=_SafeLoader)
     doi_yaml = all_yaml['doi_jekyll']
     return {
         **doi_yaml,
         'url': all_yaml['url']
     }
 def collectPostData(file):
-    """Collect data from blog post file."""
-    return frontmatter.loads(file.read())
-def collectAuthorsData(authornames: list[str] | str, args):
+    """
+    Collect data from blog post file.
+    Only the YAML frontmatter is read and parsed (up to the closing `---`); the body of the post is not needed for the metadata and is skipped.
+    """
+    post = frontmatter.Post(content='')
+    if file.readline().rstrip() != '---':
+        return post
+    frontmatter_lines = []
+    for line in file:
+        if line.rstrip() == '---':
+            break
+        frontmatter_lines.append(line)
+    post.metadata.update(yaml.load(''.join(frontmatter_lines), Loader=_SafeLoader) or {})
+    return post
+@functools.lru_cache(maxsize=1024)
+def parseDateString(date: str) -> datetime.datetime:
+    """
+    Parse a date string.
+    ISO 8601 dates and Jekyll's usual formats (`_DATE_FORMATS`, needed for Python < 3.11) are handled by the standard library; only other formats go through the (slow) `dateparser`.
+    Results are cached, as posts processed in one run often share their date.
+    """
+    try:
+        return datetime.datetime.fromisoformat(date)
+    except ValueError:
+        pass
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(date, date_format)
+        except ValueError:
+            pass
+    import dateparser  # slow to import; only needed here
+    return dateparser.parse(date)
+def parsePostDate(data_post) -> datetime.date:
+    """
+    Parse the date of a blog post.
+    This is done only once per post and the result handed to everything needing the date.
+    If the YAML frontmatter already yielded a date object (for plain `YYYY-MM-DD` dates), it is taken as-is.
+    """
+    if isinstance(data_post['date'], datetime.date):
+        return data_post['date']
+    return parseDateString(data_post['date'])
+def collectAuthorsData(authornames: list[str] | str, args, authors):
     """
     Collect data from author file.
     Either directly take an author file as supplied by command line arguments, or search for `authorname` in the default/a specified directory.
+    Each author file is loaded only once per run, as the posts processed in one run often share their authors; `authors` maps the file names to the data already loaded.
     """
     _loaded_authors = []
     authornames = [authornames] if isinstance(authornames, str) else authornames
@@ -58,8 +115,10 @@ def collectAuthorsData(authornames: list[str] | str, args):
                 exit()
             filename = args.author_file
         else:
-            filename = PurePath(args.authors_dir, authorname.lower()).with_suffix('.md')
-        _loaded_authors.append(frontmatter.load(filename))
+            filename = os.path.join(args.authors_dir, f'{authorname.lower()}.md')
+        if filename not in authors:
+            authors[filename] = frontmatter.load(filename)
+        _loaded_authors.append(authors[filename])
     return _loaded_authors
 def genDoi(title: str, base: str, prefix: str) -> str:
     """
@@ -68,115 +127,151 @@ def genDoi(title: str, base: str, prefix: str) -> str:
     Use the global blog identifier as the first part of the suffix (the `base`).
     Use the global prefix as the identifier before the slash.
     """
-    import base64
-    import hashlib
     hsh = hashlib.sha1(title.encode()).digest()
     b64 = base64.urlsafe_b64encode(hsh).decode()
     b64_short = b64.rstrip('=').replace('-', '').replace('_', '').lower()[0:6]
     return f'{prefix}/{base}-{b64_short}'
-def registerMetadata(data_blog, dj_data_xml, doi, user, password):
+def dictToXml(data: dict) -> etree._Element:
+    """
+    Convert the metadata dictionary to an lxml element tree.
+    Follows the conventions of `xmltodict`: keys starting with `@` are attributes, `#text` is the text of an element, lists become repeated elements, booleans become `true`/`false`.
+    Namespace declarations (`@xmlns`, `@xmlns:PREFIX`) are resolved for the element declaring them and everything below, such that prefixed names (like `xsi:schemaLocation` or `xml:lang`) end up in their namespace; un-prefixed elements are put into the default namespace.
+    """
+    def qualify(name, lookup, default=None):
+        prefix, _, local = name.rpartition(':')
+        if prefix and prefix not in lookup:
+            logging.error('XML: Namespace prefix of %s is not declared in the metadata.', name)
+            sys.exit()
+        uri = lookup[prefix] if prefix else default
+        return f'{{{uri}}}{local}' if uri else local
+    def text(value):
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        return '' if value is None else str(value)
+    def build(parent, name, value, lookup):
+        declared = {}
+        if isinstance(value, dict):
+            declared = {
+                (None if key == '@xmlns' else key.removeprefix('@xmlns:')): uri
+                for key, uri in value.items()
+                if key == '@xmlns' or key.startswith('@xmlns:')
+            }
+            lookup = {**lookup, **declared}
+        tag = qualify(name, lookup, default=lookup.get(None))
+        element = etree.Element(tag, nsmap=declared) if parent is None else etree.SubElement(parent, tag, nsmap=declared)
+        if not isinstance(value, dict):
+            if value is not None:
+                element.text = text(value)
+            return element
+        for key, child in value.items():
+            if key == '@xmlns' or key.startswith('@xmlns:'):
+                continue
+            elif key.startswith('@'):
+                element.set(qualify(key[1:], lookup), text(child))
+            elif key == '#text':
+                element.text = text(child)
+            else:
+                for item in (child if isinstance(child, list) else [child]):
+                    build(element, key, item, lookup)
+        return element
+    (root_tag, root_data), = data.items()
+    return build(None, root_tag, root_data, {'xml': 'http://www.w3.org/XML/1998/namespace'})
+def registerMetadata(session, data_blog, dj_data_xml, doi, user, password):
     """
     Register metadata for a DOI at DataCite.
     PUT data, as assembled previously and converted to XML, with proper header and auth to the API endpoint, as specified in the global blog config.
+    The `session` is shared with the URL registration, so that the connection to DataCite is kept alive and reused.
     """
     dj_header = {
         'Content-Type': 'application/xml;charset=UTF-8',
     }
-    return requests.put(
+    return session.put(
         f'{data_blog["provider_url"]}/metadata/{doi}', 
         headers=dj_header, 
-        data=dj_data_xml.encode('utf-8'), 
+        data=dj_data_xml, 
         auth=(user, password)
     )
-def genPermalink(data_blog, post_filename, data_post):
+def genPermalink(data_blog, post_filename, post_date):
     """
     Generate a permalink for a post of a blog.
     Tries to emulate some Jekyll defaults. Will probably not work for every case, especially not for cases with different-than-default permalink configuration. This one assumes https://BASEURL/YEAR/MONTH/DATE/FILENAME.html.
     """
-    import re
-    regex_filename = r"(\d{4}-\d{1,2}-\d{1,2}-)(.*)"
-
     url_base = data_blog['url'].rstrip('/')
-    post_date_raw = dateparser.parse(data_post['date'])
-    post_date_formatted = post_date_raw.strftime('%Y/%m/%d')
-    post_filename_base = PurePath(post_filename).stem
-    post_filename_matched = re.search(regex_filename, post_filename_base)
+    post_date_formatted = post_date.strftime('%Y/%m/%d')
+    post_filename_base = os.path.splitext(os.path.basename(post_filename))[0]
+    post_filename_matched = _FILENAME_RE.match(post_filename_base)
     if post_filename_matched is None:
-        logger.error(f'PERMALINK: Can not create URL from Markdown file.')
+        logging.error('PERMALINK: Can not create URL from Markdown file %s.', post_filename)
         sys.exit()
     else:
         post_filename_clean = post_filename_matched.group(2)
     return f'{url_base}/{post_date_formatted}/{post_filename_clean}.html'
-def registerUrl(data_blog, post_filename, data_post, doi, user, password):
+def registerUrl(session, data_blog, post_filename, post_date, doi, user, password):
     """
     Register URL for a DOI at DataCite, which had previously its metadata registered.
     PUT ad-hoc created data payload with DOI and URL (with proper header and auth) to the API endpoint.
     """
-    import textwrap
-    url = genPermalink(data_blog=data_blog, post_filename=post_filename, data_post=data_post)
-    logging.debug(f'Assembled permalink {url} from filename {post_filename}')
-    data = textwrap.dedent(
-        f'''\
-            #Content-Type:text/plain;charset=UTF-8
-            doi= {doi}
-            url= {url}\
-        ''')
-    logging.debug(f'DataCite URL registration payload:\n{data}')
+    url = genPermalink(data_blog=data_blog, post_filename=post_filename, post_date=post_date)
+    logging.debug('Assembled permalink %s from filename %s', url, post_filename)
+    data = f'#Content-Type:text/plain;charset=UTF-8\ndoi= {doi}\nurl= {url}'
+    logging.debug('DataCite URL registration payload:\n%s', data)
     dj_header = {
         'Content-Type': 'text/plain;charset=UTF-8',
     }
-    return requests.put(
+    return session.put(
         f'{data_blog["provider_url"]}/doi/{doi}',
         headers=dj_header, 
         data=data, 
         auth=(user, password)
     )
-def updateBlogpostMarkdown(data_post, post_filename, doi):
+def updateBlogpostMarkdown(post_filename, doi):
     """
     Add DOI key to YAML frontmatter of blogpost.
     Updates the blogpost for which a DOI was just registered.
+    The `doi` line is spliced in just before the closing `---` of the frontmatter (replacing an existing top-level `doi` key), leaving all other lines of the post untouched; nothing is re-serialized through YAML.
     """
-    data_post['doi'] = f'https://doi.org/{doi}'
-    return frontmatter.dump(
-        data_post, 
-        post_filename, 
-        sort_keys=False,  # original YAML frontmatter keys are probably also not sored
-        width=float("inf")  # especially the abstract might be unformatted text; we should change this
-    )
+    with open(post_filename, 'r+', encoding='utf-8', newline='') as file:
+        lines = file.readlines()
+        end = next((i for i, line in enumerate(lines) if i > 0 and line.rstrip() == '---'), None)
+        if lines[0].rstrip() != '---' or end is None:
+            logging.error('FRONTMATTER: Can not find YAML frontmatter in %s to add DOI to.', post_filename)
+            sys.exit()
+        newline = '\r\n' if lines[0].endswith('\r\n') else '\n'
+        frontmatter_lines = [line for line in lines[1:end] if not line.startswith('doi:')]
+        file.seek(0)
+        file.writelines([lines[0], *frontmatter_lines, f'doi: https://doi.org/{doi}{newline}', *lines[end:]])
+        file.truncate()
 
-def main():
+def processBlogpost(post_file, args, raw_data_blog, authors, session, dc_user, dc_password):
     """
-    Run through the workflow of registering a DOI for a blogpost, assembling data from different sources.
-    Logging is available on different levels.
+    Register a DOI for a single blogpost, assembling data from the post, its authors, and the already collected blog data.
+    The loaded `authors`, the DataCite credentials and HTTP `session` are shared between all posts of a run.
     """
-    args = cli.parseArguments()
-    setLogging(args)
-    logging.debug(f'Argparse arguments: {args}')
-    dc_user, dc_password = parseCredentials(args.user, args.password)
-    logging.debug(f'Using DataCite user ..{dc_user[2:-4]}.. and password ..{dc_password[3:-6]}...')
-
-    raw_data_blog = collectBlogData(args.config)
-    logging.debug(f'Parsed raw data from blog: {raw_data_blog}')
-    raw_data_post = collectPostData(args.blogpost[0])
-    logging.debug(f'Parsed raw data from post: {raw_data_post.metadata}')
-    raw_data_authors = collectAuthorsData(raw_data_post['author'], args)
-    logging.debug('Parsed raw data from author: {_author}'.format(_author=[*(str(raw_data_author.metadata) for raw_data_author in raw_data_authors)]))
+    with post_file:
+        raw_data_post = collectPostData(post_file)
+    logging.debug('Parsed raw data from post: %s', raw_data_post.metadata)
+    post_date = parsePostDate(raw_data_post)
+    raw_data_authors = collectAuthorsData(raw_data_post['author'], args, authors)
+    logging.debug('Parsed raw data from author: %s', [raw_data_author.metadata for raw_data_author in raw_data_authors])
 
     if 'doi' in raw_data_post and not args.force:
-        sys.exit(f'DOI already exists for blog post ({raw_data_post["doi"]}). Launch with "-f" to force overwrite.')
+        sys.exit(f'DOI already exists for blog post {post_file.name} ({raw_data_post["doi"]}). Launch with "-f" to force overwrite.')
     raw_data_post['doi'] = genDoi(title=raw_data_post['title'], base=raw_data_blog['suffix_base'], prefix=raw_data_blog['prefix'])
-    logging.debug(f"Auto-generated DOI {raw_data_post['doi']}")
+    logging.debug('Auto-generated DOI %s', raw_data_post['doi'])
 
-    dj_data_json = metadata.assembleMetadata(data_blog=raw_data_blog, data_post=raw_data_post, data_authors=raw_data_authors, additional_metadata=args.additional_metadata)
-    logging.debug(f"Metadata JSON:\n{json.dumps(dj_data_json, indent=4)}")
+    dj_data_json = metadata.assembleMetadata(data_blog=raw_data_blog, data_post=raw_data_post, post_date=post_date, data_authors=raw_data_authors, additional_metadata=args.additional_metadata)
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Metadata JSON:\n%s", _dumpJson(dj_data_json))
 
-    dj_data_xml = xmltodict.unparse(dj_data_json)
-    logging.info(f"Metadata XML:\n{xmltodict.unparse(dj_data_json, pretty=True)}")
+    dj_data_tree = dictToXml(dj_data_json)
+    dj_data_xml = etree.tostring(dj_data_tree, xml_declaration=True, encoding='UTF-8')
+    if logging.getLogger().isEnabledFor(logging.INFO):  # pretty-printing is only needed for the log
+        logging.info("Metadata XML:\n%s", etree.tostring(dj_data_tree, pretty_print=True, encoding='unicode'))
 
     if args.dry_run:
         logging.warning("DRY-RUN: Not registering metadata with DataCite")
     else:
-        dj_regMd_result = registerMetadata(data_blog=raw_data_blog, dj_data_xml=dj_data_xml, doi=raw_data_post['doi'], user=dc_user, password=dc_password)
+        dj_regMd_result = registerMetadata(session=session, data_blog=raw_data_blog, dj_data_xml=dj_data_xml, doi=raw_data_post['doi'], user=dc_user, password=dc_password)
         logging.debug(dj_regMd_result.text)
         logging.debug(dj_regMd_result.headers)
         if not dj_regMd_result.ok:
@@ -191,7 +286,7 @@ def main():
         if args.dry_run:
             logging.warning("DRY-RUN: Not registering URL with DataCite")
     else:
-        dj_regUrl_result = registerUrl(data_blog=raw_data_blog, data_post=raw_data_post, post_filename=args.blogpost[0].name, doi=raw_data_post['doi'], user=dc_user, password=dc_password)
+        dj_regUrl_result = registerUrl(session=session, data_blog=raw_data_blog, post_date=post_date, post_filename=post_file.name, doi=raw_data_post['doi'], user=dc_user, password=dc_password)
         logging.debug(dj_regUrl_result.text)
         logging.debug(dj_regUrl_result.headers)
         if not dj_regUrl_result.ok:
@@ -203,8 +298,32 @@ def main():
     if args.dry_run:
         logging.warning("DRY-RUN: Not changing blog post's YAML Frontmatter to include DOI")
     else:
-        _ = updateBlogpostMarkdown(data_post=raw_data_post, post_filename=args.blogpost[0].name, doi=raw_data_post['doi'])
+        updateBlogpostMarkdown(post_filename=post_file.name, doi=raw_data_post['doi'])
     print(f"Successfully created {raw_data_post['doi']} at DataCite!")
+
+def main(args=None):
+    """
+    Run through the workflow of registering DOIs for blogposts, assembling data from different sources.
+    Blog data, credentials, and the connection to DataCite are set up once and shared by all given posts.
+    Logging is available on different levels.
+    Command line arguments are parsed, unless already parsed `args` are given.
+    The HTTP stack is only imported after parsing the arguments, so that `--help` and usage errors return quickly.
+    """
+    if args is None:
+        args = cli.parseArguments()
+    import requests
+    setLogging(args)
+    logging.debug('Argparse arguments: %s', args)
+    dc_user, dc_password = parseCredentials(args.user, args.password)
+    logging.debug('Using DataCite user ..%s.. and password ..%s...', dc_user[2:-4], dc_password[3:-6])
+
+    raw_data_blog = collectBlogData(args.config)
+    logging.debug('Parsed raw data from blog: %s', raw_data_blog)
+
+    authors = {}  # author file name: author data, loaded once per run
+    with requests.Session() as session:  # DataCite needs the metadata before the URL, so requests are sequential but share the connection
+        for post_file in args.blogpost:
+            processBlogpost(post_file=post_file, args=args, raw_data_blog=raw_data_blog, authors=authors, session=session, dc_user=dc_user, dc_password=dc_password)
     return 0
 
 if __name__ == '__main__':
@@ -1,204 +1,205 @@
 #!/usr/bin/env python3
 # SPDX-License-Identifier: MIT
 # Author: Andreas Herten, 2022
+import sys
+import copy
 import logging
+from types import MappingProxyType
 
-import dateparser
-from mergedeep import merge
-
-class extDict(dict):
-    """This class extends the dict() method for the
-    &
-    &=
-    operators (like | and |=), to add deepmerge functionality of `mergedeep`.
-    It is currently not used as I fear reduced clarity.
-    """
-    def __init__(self, *args, **kwargs):
-        super(extDict, self).__init__(*args, **kwargs)
-    def __and__(self, other):
-        return merge({}, self, other)
-    def __rand__(self, other):
-        return merge({}, other, self)
-    def __iand__(self, other):
-        return merge(self, other)
+_LICENSES = {  # short-name: (read-only) rights entry, built once from (SPDX identifier, URL); handed out as a copy
+    short_name: MappingProxyType({
+        '@schemeURI': 'https://spdx.org/licenses/',
+        '@rightsIdentifierScheme': 'SPDX',
+        '@rightsIdentifier': license,
+        '@rightsURI': url
+    })
+    for short_name, (license, url) in {
+        'mit': ('MIT', 'https://spdx.org/licenses/MIT.html'),
+        'cc0': ('CC0-1.0', 'https://creativecommons.org/publicdomain/zero/1.0/'),
+        'cc-by4': ('CC-BY-4.0', 'https://creativecommons.org/licenses/by/4.0/'),
+        'cc-by-sa4': ('CC-BY-SA-4.0', 'https://creativecommons.org/licenses/by-sa/4.0/legalcode'),
+        'gpl3': ('GPL-3.0-only', 'https://opensource.org/licenses/GPL-3.0'),
+    }.items()
+}
 def parseLicense(data_post) -> dict:
     """
     Take a license short-name ('mit') and make the SPDX proper identifier form it, including an URL.
-    Is not smart but will just look up the short-name. Needs to be extended for new licenses.
+    Is not smart but will just look up the short-name in `_LICENSES`. Needs to be extended for new licenses.
+    A plain copy of the prebuilt (read-only) entry is returned, like all getters of constants do.
     """
     # could be extended via https://github.com/nexB/license-expression maybe
-    if 'license' not in data_post:
-        logging.warning(f'METADATA: No license specified!')
+    license = data_post.get('license')
+    if license is None:
+        logging.warning('METADATA: No license specified!')
         return None
-    else:
-        match data_post['license'].lower():
-            case 'mit':
-                license='MIT'
-                url='https://spdx.org/licenses/MIT.html'
-            case 'cc0':
-                license='CC0-1.0'
-                url='https://creativecommons.org/publicdomain/zero/1.0/'
-            case 'cc-by4':
-                license='CC-BY-4.0'
-                url='https://creativecommons.org/licenses/by/4.0/'
-            case 'cc-by-sa4':
-                license='CC-BY-SA-4.0'
-                url='https://creativecommons.org/licenses/by-sa/4.0/legalcode'
-            case 'gpl3':
-                license='GPL-3.0-only'
-                url='https://opensource.org/licenses/GPL-3.0'
-            case _:
-                logging.error(f"License {data_post['license']} unknown. Please extend license-parsing in tool!")
-                sys.exit()
-        logging.debug(f'License {license} at {url}')
-        return {
-            '@schemeURI': 'https://spdx.org/licenses/',
-            '@rightsIdentifierScheme': 'SPDX',
-            '@rightsIdentifier': license,
-            '@rightsURI': url
-        }
+    entry = _LICENSES.get(license.lower())
+    if entry is None:
+        logging.error("License %s unknown. Please extend license-parsing in tool!", license)
+        sys.exit()
+    logging.debug('License %s at %s', entry['@rightsIdentifier'], entry['@rightsURI'])
+    return dict(entry)
+_MD_SCHEMA = MappingProxyType({  # read-only constants; the getters hand out plain (flat) copies, never the constants themselves
+    '@xmlns:xsi': 'http://www.w3.org/2001/XMLSchema-instance',
+    '@xmlns': 'http://datacite.org/schema/kernel-4',
+    '@xsi:schemaLocation': 'http://datacite.org/schema/kernel-4 http://schema.datacite.org/meta/kernel-4/metadata.xsd'
+})
+_MD_RESOURCE_TYPE = MappingProxyType({
+    "@resourceTypeGeneral": "Text",
+    "#text": "BlogPosting"
+})
+_MD_FORMATS = MappingProxyType({
+    'format': 'HTML'
+})
 def getMdSchema():
+    return dict(_MD_SCHEMA)
+def getMdIdentifier(data_post):
     return {
-        '@xmlns:xsi': 'http://www.w3.org/2001/XMLSchema-instance',
-        '@xmlns': 'http://datacite.org/schema/kernel-4',
-        '@xsi:schemaLocation': 'http://datacite.org/schema/kernel-4 http://schema.datacite.org/meta/kernel-4/metadata.xsd'
+        '@identifierType': 'DOI',
+        '#text': data_post['doi'],
     }
-def getMdIdentifier(data_post):
+def getMdCreator(data_blog, data_author):
+    """
+    Generate the creator entry of a single author.
+    """
     return {
-        'identifier': {
-            '@identifierType': 'DOI',
-            '#text': data_post['doi'],
-        }
+        'creatorName': {
+            '@nameType': 'Personal',
+            '#text': data_author['name']
+        },
+        'givenName': data_author['first_name'],
+        'familyName': data_author['last_name'],
+        'nameIdentifier': {
+            '@nameIdentifierScheme': 'ORCID',
+            '@schemeURI': 'https://orcid.org',
+            '#text': f'https://orcid.org/{data_author["orcid_id"]}'
+        },
+        'affiliation': data_blog['affiliation']
     }
 def getMdCreators(data_blog, data_authors):
-    _author_list = []
-    for data_author in data_authors:
-        _author_list.append({
-            'creatorName': {
-                '@nameType': 'Personal',
-                '#text': data_author['name']
-            },
-            'givenName': data_author['first_name'],
-            'familyName': data_author['last_name'],
-            'nameIdentifier': {
-                '@nameIdentifierScheme': 'ORCID',
-                '@schemeURI': 'https://orcid.org',
-                '#text': f'https://orcid.org/{data_author["orcid_id"]}'
-            },
-            'affiliation': data_blog['affiliation']
-        })
     return {
-        'creators': {
-            'creator': _author_list
-        }
+        'creator': [getMdCreator(data_blog=data_blog, data_author=data_author) for data_author in data_authors]
     }
 def getMdTitles(data_post):
     return {
-        'titles': {
-            'title': {
-                '@xml:lang': 'en',
-                '#text': data_post['title']
-            }
+        'title': {
+            '@xml:lang': 'en',
+            '#text': data_post['title']
         }
     }
-def getMdPublicationYear(data_post):
-    return {
-        'publicationYear': dateparser.parse(data_post['date']).strftime('%Y')
-    }
+def getMdPublicationYear(post_date):
+    return post_date.strftime('%Y')
 def getMdPublisher(data_blog):
-    return {
-        'publisher': data_blog['publisher']
-    }
+    return data_blog['publisher']
 def getMdResourceType():
-    return {
-        'resourceType': {
-            "@resourceTypeGeneral": "Text",
-            "#text": "BlogPosting"
-        }
-    }
+    return dict(_MD_RESOURCE_TYPE)
 def getMdLanguage():
-    return {
-        'language': 'en'
-    }
+    return 'en'
 def getMdFormats():
-    return {
-        'formats': {
-            'format': 'HTML'
-        }
-    }
+    return dict(_MD_FORMATS)
 def getMdVersion(data_post):
-    return {
-        'version': data_post['version'] if 'version' in data_post else '1.0',
-    }
+    version = data_post.get('version')
+    return '1.0' if version is None else version
 def getMdRightsList(data_post):
     return {
-        'rightsList': {
-            'rights': parseLicense(data_post)
-        }
+        'rights': parseLicense(data_post)
     }
 def getMdSubjects(data_post):
     return {
-        'subjects': {
-            'subject': data_post['tags'].split()
-        }
+        'subject': data_post['tags'].split()
     }
 def getMdDescriptions(data_post):
-    if 'abstract' not in data_post:
-        print(f'METADATA: Note, no abstract given!')
-        return {}
+    abstract = data_post.get('abstract')
+    if abstract is None:
+        print('METADATA: Note, no abstract given!')
+        return None
     else:
         return {
-            'descriptions': {
-                'description': {
-                    "@descriptionType": "Abstract",
-                    "#text": data_post['abstract']
-                }
+            'description': {
+                "@descriptionType": "Abstract",
+                "#text": abstract
             }
         }
 def getMdRelToBlog(data_blog):
-    if 'doi' in data_blog:
-        logging.info(f'METADATA: Add relation to entire blog with DOI {data_blog["doi"]}.')
+    doi = data_blog.get('doi')
+    if doi is not None:
+        logging.info('METADATA: Add relation to entire blog with DOI %s.', doi)
         return {
-            'relatedIdentifiers': {
-                'relatedIdentifier': {
-                    '@relatedIdentifierType': 'DOI',
-                    '@relationType': 'IsPartOf',
-                    '#text': data_blog['doi']
-                }
+            'relatedIdentifier': {
+                '@relatedIdentifierType': 'DOI',
+                '@relationType': 'IsPartOf',
+                '#text': doi
             }
         }
     else:
-        return {}
+        return None
 def addAdditionalMetadata(additional_metadata):
     if additional_metadata:
-        logging.info(f'METADATA: Add additional metadata {additional_metadata}')
+        logging.info('METADATA: Add additional metadata %s', additional_metadata)
         return additional_metadata
     else:
-        return {}
-def assembleMetadata(data_blog, data_post, data_authors, additional_metadata) -> dict:
+        return None
+def mergeAdditionalMetadata(data, additional_metadata):
     """
-    Generate dictionary to be uploaded as metadata to DataCite.
-    All level 1 keys (with 'resource' being considered as level 0) are generated in dedicated functions and merged into the internal `data` dictionary.
-    Some dedicated functions only contain static values and hence no arguments, others need global data from the blog (`data_blog`), data from the specific post (`data_post`), or data from the authors (`data_authors`)
+    Deep-merge additional metadata into `data`.
+    If no key of `additional_metadata` refers to a dictionary in `data`, nothing needs to be merged recursively and a plain update suffices.
+    Otherwise, `merge` writes into nested dictionaries of `data`, some of which are shared between posts; hence, the entries of `data` which are merged into are copied first.
     """
-    data = dict()
-    data |= getMdSchema()  # this is new Python 3.9 syntax to merge two dictionaries
-    data |= getMdIdentifier(data_post=data_post)
-    data |= getMdCreators(data_blog=data_blog, data_authors=data_authors)
-    data |= getMdTitles(data_post=data_post)
-    data |= getMdPublicationYear(data_post=data_post)
-    data |= getMdPublisher(data_blog=data_blog)
-    data |= getMdResourceType()
-    data |= getMdLanguage()
-    data |= getMdFormats()
-    data |= getMdVersion(data_post=data_post)
-    data |= getMdRightsList(data_post=data_post)
-    data |= getMdSubjects(data_post=data_post)
-    data |= getMdDescriptions(data_post=data_post)
-    data |= getMdRelToBlog(data_blog=data_blog)
-    merge(data, addAdditionalMetadata(additional_metadata=additional_metadata))
-    if 'doi-additional-metadata' in data_post:
-        merge(data, addAdditionalMetadata(additional_metadata=data_post['doi-additional-metadata']))
-    return {
-        'resource': data
-    }
\ No newline at end of file
+    if not any(isinstance(data.get(key), dict) for key in additional_metadata):
+        data |= additional_metadata
+        return data
+    from mergedeep import merge  # only needed here
+    for key in additional_metadata.keys() & data.keys():
+        data[key] = copy.deepcopy(data[key])
+    return merge(data, additional_metadata)
+_MD_GETTERS = (  # level 1 key, function generating its value, names of the arguments of the function
+    ('identifier', getMdIdentifier, ('data_post',)),
+    ('creators', getMdCreators, ('data_blog', 'data_authors')),
+    ('titles', getMdTitles, ('data_post',)),
+    ('publicationYear', getMdPublicationYear, ('post_date',)),
+    ('publisher', getMdPublisher, ('data_blog',)),
+    ('resourceType', getMdResourceType, ()),
+    ('language', getMdLanguage, ()),
+    ('formats', getMdFormats, ()),
+    ('version', getMdVersion, ('data_post',)),
+    ('rightsList', getMdRightsList, ('data_post',)),
+    ('subjects', getMdSubjects, ('data_post',)),
+    ('descriptions', getMdDescriptions, ('data_post',)),
+    ('relatedIdentifiers', getMdRelToBlog, ('data_blog',)),
+)
+_MD_OPTIONAL = ('descriptions', 'relatedIdentifiers')  # level 1 keys which are left out if their function returns None
+def assembleMetadataMany(data_blog, posts, additional_metadata) -> list[dict]:
+    """
+    Generate dictionaries to be uploaded as metadata to DataCite, for several posts of a blog at once.
+    `posts` are tuples of `(data_post, post_date, data_authors)`; the `additional_metadata` (from the command line) applies to all of them.
+    The values of all level 1 keys (with 'resource' being considered as level 0) are generated by the dedicated functions listed in `_MD_GETTERS` and put into the internal `data` dictionary in that order; if the function of an optional key (`_MD_OPTIONAL`) returns None, the key is left out.
+    Some dedicated functions only return static values (module-level constants) and hence have no arguments, others need global data from the blog (`data_blog`), data from the specific post (`data_post`), or data from the authors (`data_authors`).
+    Values of functions needing nothing but the blog data (or nothing at all) are generated once, before iterating over the posts.
+    Hence, the returned resources share nested dictionaries with each other (like `relatedIdentifiers`, `resourceType`, and `formats`), and the creators of all posts share the `affiliation` of the blog data; a resource needs to be copied before being modified in place.
+    The date of a post is passed readily parsed (`post_date`).
+    """
+    blog_values = {
+        key: getter(**{name: data_blog for name in argument_names})
+        for key, getter, argument_names in _MD_GETTERS
+        if set(argument_names) <= {'data_blog'}
+    }
+    resources = []
+    for data_post, post_date, data_authors in posts:
+        arguments = {'data_blog': data_blog, 'data_post': data_post, 'post_date': post_date, 'data_authors': data_authors}
+        data = getMdSchema()
+        for key, getter, argument_names in _MD_GETTERS:
+            value = blog_values[key] if key in blog_values else getter(**{name: arguments[name] for name in argument_names})
+            if value is not None or key not in _MD_OPTIONAL:
+                data[key] = value
+        for additional in (additional_metadata, data_post.get('doi-additional-metadata')):  # from command line, then from the post
+            if (extra := addAdditionalMetadata(additional_metadata=additional)) is not None:
+                mergeAdditionalMetadata(data, extra)
+        resources.append({
+            'resource': data
+        })
+    return resources
+def assembleMetadata(data_blog, data_post, post_date, data_authors, additional_metadata) -> dict:
+    """
+    Generate dictionary to be uploaded as metadata to DataCite, for a single post.
+    See `assembleMetadataMany` for details.
+    """
+    return assembleMetadataMany(data_blog=data_blog, posts=[(data_post, post_date, data_authors)], additional_metadata=additional_metadata)[0]
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""
+Run the whole workflow on the example blog, with the requests to DataCite mocked.
+"""
+import os
+import shutil
+from unittest import mock
+
+import pytest
+
+from doijekyll import cli, doijekyll
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), os.pardir, 'examples')
+POST = os.path.join('_posts', '2022-09-12-doi-jekyll-example.md')
+
+@pytest.fixture
+def blog(tmp_path, monkeypatch):
+    shutil.copytree(EXAMPLES, tmp_path, dirs_exist_ok=True)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def test_success(blog, monkeypatch):
+    monkeypatch.setattr('sys.argv', ['doi-jekyll', '-u', 'user', '-p', 'password', POST])
+    with mock.patch('requests.Session') as Session:
+        session = Session.return_value.__enter__.return_value
+        session.put.return_value.ok = True
+        assert doijekyll.main(cli.parseArguments()) == 0
+    urls = [call.args[0] for call in session.put.call_args_list]
+    assert urls == [
+        'https://mds.test.datacite.org/metadata/18.10213/doijekyll-cgcwso',
+        'https://mds.test.datacite.org/doi/18.10213/doijekyll-cgcwso',
+    ]
+    with open(blog / POST) as file:
+        assert 'doi: https://doi.org/18.10213/doijekyll-cgcwso\n' in file.read().split('---')[1]
+
+def test_authors_loaded_once_per_run(blog, monkeypatch):
+    second = os.path.join('_posts', '2022-09-13-second-example.md')
+    with open(blog / POST) as file, open(blog / second, 'w') as copy:
+        copy.write(file.read().replace('title: Example DOI Jekyll Post', 'title: Second Example'))
+    monkeypatch.setattr('sys.argv', ['doi-jekyll', '-d', '-u', 'user', '-p', 'password', POST, second])
+    with mock.patch('frontmatter.load', wraps=doijekyll.frontmatter.load) as load:
+        assert doijekyll.main(cli.parseArguments()) == 0
+        assert doijekyll.main(cli.parseArguments()) == 0
+    assert load.call_count == 2  # once for each run, not once for each post
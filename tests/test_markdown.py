@@ -0,0 +1,33 @@
+"""
+Check that the DOI line is spliced into the frontmatter of a post, leaving everything else of the file as it was.
+"""
+import pytest
+
+from doijekyll import doijekyll
+
+DOI = '18.10213/doijekyll-cgcwso'
+
+def update(tmp_path, content):
+    post = tmp_path / '2022-09-12-post.md'
+    post.write_bytes(content.encode('utf-8'))
+    doijekyll.updateBlogpostMarkdown(post_filename=str(post), doi=DOI)
+    return post.read_bytes().decode('utf-8')
+
+def test_lf(tmp_path):
+    assert update(tmp_path, '---\ntitle: Á post\n---\n\nBody\n---\n') == f'---\ntitle: Á post\ndoi: https://doi.org/{DOI}\n---\n\nBody\n---\n'
+
+def test_crlf(tmp_path):
+    assert update(tmp_path, '---\r\ntitle: Á post\r\n---\r\n\r\nBody\r\n') == f'---\r\ntitle: Á post\r\ndoi: https://doi.org/{DOI}\r\n---\r\n\r\nBody\r\n'
+
+def test_replace_existing_doi(tmp_path):
+    assert update(tmp_path, '---\ndoi: https://doi.org/18.10213/old\ntitle: Post\n---\nBody\n') == f'---\ntitle: Post\ndoi: https://doi.org/{DOI}\n---\nBody\n'
+
+def test_keep_indented_doi(tmp_path):
+    content = '---\nabstract: |\n  doi: not a key\ntitle: Post\n---\nBody\n'
+    assert update(tmp_path, content) == f'---\nabstract: |\n  doi: not a key\ntitle: Post\ndoi: https://doi.org/{DOI}\n---\nBody\n'
+
+def test_missing_closing_delimiter(tmp_path):
+    content = '---\ntitle: Post\n\nBody\n'
+    with pytest.raises(SystemExit):
+        update(tmp_path, content)
+    assert (tmp_path / '2022-09-12-post.md').read_text(encoding='utf-8') == content
@@ -0,0 +1,45 @@
+"""
+Check that `dictToXml` serializes metadata the same way `xmltodict.unparse`, which it replaces, did.
+"""
+import os
+import argparse
+
+import pytest
+from lxml import etree
+
+from doijekyll import doijekyll, metadata
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), os.pardir, 'examples')
+
+def canonical(xml):
+    return etree.tostring(etree.fromstring(xml), method='c14n')
+
+def assertSameAsXmltodict(data):
+    xmltodict = pytest.importorskip('xmltodict')  # only needed as the reference here, not by doijekyll itself
+    assert canonical(etree.tostring(doijekyll.dictToXml(data))) == canonical(xmltodict.unparse(data).encode())
+
+def test_example_post():
+    args = argparse.Namespace(author_file=None, authors_dir=os.path.join(EXAMPLES, '_authors'))
+    with open(os.path.join(EXAMPLES, '_config.yml')) as file:
+        data_blog = doijekyll.collectBlogData(file)
+    with open(os.path.join(EXAMPLES, '_posts', '2022-09-12-doi-jekyll-example.md')) as file:
+        data_post = doijekyll.collectPostData(file)
+    data_authors = doijekyll.collectAuthorsData(data_post['author'], args, {})
+    data_post['doi'] = doijekyll.genDoi(title=data_post['title'], base=data_blog['suffix_base'], prefix=data_blog['prefix'])
+    data = metadata.assembleMetadata(data_blog=data_blog, data_post=data_post, post_date=doijekyll.parsePostDate(data_post), data_authors=data_authors, additional_metadata={'version': 1.5, 'language': None})
+    assertSameAsXmltodict(data)
+
+def test_booleans():
+    assertSameAsXmltodict({'r': {'@a': True, 'b': False, 'c': [True, 1]}})
+
+def test_nested_namespaces():
+    assertSameAsXmltodict({'r': {
+        '@xmlns': 'http://a',
+        'x': {'@xmlns': 'http://other', 'y': 'z'},
+        'o': {'@xmlns:o': 'http://o', 'o:y': {'@o:k': 'v', '#text': 't'}},
+        'w': {'@xmlns': '', 'q': 1},
+    }})
+
+def test_undeclared_prefix():
+    with pytest.raises(SystemExit):
+        doijekyll.dictToXml({'r': {'dc:x': 'y'}})